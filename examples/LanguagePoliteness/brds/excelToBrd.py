@@ -12,7 +12,6 @@ Excel format:
 """
 
 import pandas as pd
-import importlib.util
 try:
     import jieba
 except ImportError:
@@ -20,23 +19,137 @@ except ImportError:
     import subprocess
     subprocess.check_call([sys.executable, '-m', 'pip', 'install', 'jieba'])
     import jieba
+import copy
+import functools
+import io
+import itertools
+import logging
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
-import uuid
+from xml.sax.saxutils import escape as xml_escape
 import argparse
 import sys
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+# Short module-level alias for ET.SubElement, used where generate_brd builds elements for every
+# problem (nodes, edges, EdgesGroups); the once-built root template keeps the ET.SubElement style
+_S = ET.SubElement
+
+# Columns of the language translation CSV format
+LANGUAGE_TRANSLATION_COLUMNS = ['Situation', 'Relationship-A', 'Relationship-B', 'Formality', 'Title', 'Wrong Titles', 'Completed Sentence']
+
+# Number of person-a-word and option-word fields in the tutor interface
+MAX_PERSON_WORDS = 15
+MAX_OPTION_WORDS = 5
+
+XML_DECLARATION = b'<?xml version="1.0" standalone="yes"?>\n'
+
+# Version (4) and variant (RFC 4122) bits for generated transaction IDs
+UUID_CLEAR_MASK = ~((0xf000 << 64) | (0xc000 << 48))
+UUID_V4_BITS = (0x4000 << 64) | (0x8000 << 48)
+
+# Matchers and action labels have a fixed shape, so they are formatted as strings
+# (values must be escaped) and parsed once rather than built element by element.
+_MATCHER_TEMPLATE = (
+    '<matcher><matcherType>{mt}</matcherType>'
+    '<matcherParameter name="single">{v}</matcherParameter></matcher>'
+)
+
+_ACTION_LABEL_TEMPLATE = (
+    '<actionLabel preferPathMark="true" minTraversals="1" maxTraversals="1">'
+    '<studentHintRequest/><stepSuccessfulCompletion/><stepStudentError/>'
+    '<uniqueID>{unique_id}</uniqueID>'
+    '<message><verb>NotePropertySet</verb><properties>'
+    '<MessageType>InterfaceAction</MessageType>'
+    '<transaction_id>{transaction_id}</transaction_id>'
+    '<Selection><value>{selection}</value></Selection>'
+    '<Action><value>{action}</value></Action>'
+    '<Input><value>{input_value}</value></Input>'
+    '</properties></message>'
+    '<buggyMessage/><successMessage/>'
+    '<hintMessage>{hint_message}</hintMessage>'
+    '<callbackFn/>'
+    '<actionType>Correct Action</actionType>'
+    '<oldActionType>Correct Action</oldActionType>'
+    '<checkedStatus>Never Checked</checkedStatus>'
+    '<matchers Concatenation="true">'
+    '<Selection>{selection_matcher}</Selection>'
+    '<Action>{action_matcher}</Action>'
+    '<Input>{input_matcher}</Input>'
+    '<Actor linkTriggered="false">{actor}</Actor>'
+    '</matchers>'
+    '</actionLabel>'
+)
+
+# Load the jieba dictionary once up front rather than lazily on the first cut
+jieba.initialize()
+
+
+@functools.lru_cache(maxsize=4096)
+def cut_sentence(sentence):
+    """Split a Chinese sentence into words (cached, HMM disabled since tokens are only used as labels)."""
+    return tuple(jieba.lcut(sentence, HMM=False))
+
+
+@functools.lru_cache(maxsize=None)
+def pyarrow_csv_engine_available():
+    """Check once whether this pandas can select the pyarrow CSV engine (pyarrow installed, recent enough and supported)."""
+    try:
+        pd.read_csv(io.StringIO('a\n1\n'), dtype=str, engine='pyarrow')
+    except (ImportError, ValueError):
+        return False
+    return True
+
+
+def read_csv(path):
+    """Read a CSV with every column as str, using the faster pyarrow engine when it is available."""
+    if pyarrow_csv_engine_available():
+        return pd.read_csv(path, dtype=str, engine='pyarrow')
+    return pd.read_csv(path, dtype=str)
+
+
+# Rows handed to a worker process at a time; smaller batches are generated in-process
+ROWS_PER_CHUNK = 32
+
+_worker_generator = None
+
+
+def _init_worker():
+    """ProcessPoolExecutor initializer: give each worker its own BRDGenerator (and transaction ID RNG)"""
+    global _worker_generator
+    _worker_generator = BRDGenerator()
+
+
+def _write_problem_brds(job):
+    """ProcessPoolExecutor entry point: write one row's BRDs with the worker's BRDGenerator"""
+    return _worker_generator.write_problem_brds(*job)
+
 
 class BRDGenerator:
-    def process_csv_language_translation(self, csv_path, output_dir=None):
-        """Process a CSV file in the new language translation format and generate BRD files. Last 20% rows go to brd_test/."""
-        df = pd.read_csv(csv_path, dtype=str)
+    def process_csv_language_translation(self, csv_path, output_dir=None, df=None):
+        """Process a CSV file in the new language translation format and generate BRD files. Last 20% rows go to brd_test/.
+        An already loaded DataFrame of csv_path can be passed as df to avoid parsing the file again."""
+        if df is None:
+            df = read_csv(csv_path)
         print(f"Loaded CSV file with {len(df)} rows and {len(df.columns)} columns")
         print(f"Column names: {list(df.columns)}")
 
         # Shuffle the dataframe before splitting
         df = df.sample(frac=1, random_state=42).reset_index(drop=True)
+        # Clean the text columns once up front rather than per row (missing columns are treated as empty)
+        for col in LANGUAGE_TRANSLATION_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].fillna('').astype(str).str.strip()
+            else:
+                df[col] = ''
+        df['_wrong_titles_list'] = df['Wrong Titles'].str.split()
+
+        # One seeded RNG for option ordering, matching the sample() seed above
+        shuffle = random.Random(42).shuffle
 
         # Split into train and test (last 20% for test)
         n_rows = len(df)
@@ -55,243 +168,93 @@ class BRDGenerator:
         test_1step.mkdir(exist_ok=True)
         test_2step.mkdir(exist_ok=True)
 
-        def write_brd_files(sub_df, out_dir_1step, out_dir_2step, test_mode=False):
-            for count, (idx, row) in enumerate(sub_df.iterrows(), 1):
-                situation = str(row.get('Situation', '')).strip()
-                rel_a = str(row.get('Relationship-A', '')).strip()
-                rel_b = str(row.get('Relationship-B', '')).strip()
-                formality = str(row.get('Formality', '')).strip()
-                title = str(row.get('Title', '')).strip()
-                wrong_titles = str(row.get('Wrong Titles', '')).strip()
-                completed_sentence = str(row.get('Completed Sentence', '')).strip()
-
-                if completed_sentence:
-                    words = list(jieba.cut(completed_sentence))
-                else:
-                    words = []
-
-                # 1step: do not use formal-checkbox
-                # Randomize correct and wrong titles
-                import random
-                titles_list = [title] if title else []
-                wrong_titles_list = [w.strip() for w in wrong_titles.split() if w.strip()] if wrong_titles else []
-                all_titles = titles_list + wrong_titles_list
-                random.shuffle(all_titles)
-                problem_data_1step = {
-                    'situation-input': situation,
-                    'relationship-a-input': rel_a,
-                    'relationship-b-input': rel_b,
-                }
-                for i, w in enumerate(all_titles):
-                    problem_data_1step[f'option-word-{i+1}'] = w
-                for i, w in enumerate(words):
-                    problem_data_1step[f'person-a-word-{i+1}'] = w
-
-                # 2step: use formal-checkbox
-                problem_data_2step = problem_data_1step.copy()
-                problem_data_2step['formal-checkbox'] = formality
+        jobs = []
+
+        def add_brd_jobs(sub_df, out_dir_1step, out_dir_2step, test_mode=False):
+            # Plain dicts avoid building a Series per row
+            records = sub_df.to_dict('records')
+            for count, (idx, row) in enumerate(zip(sub_df.index, records), 1):
+                completed_sentence = row['Completed Sentence']
+
+                # Randomize correct and wrong titles (here, so the order does not depend on the workers)
+                titles_list = [row['Title']] if row['Title'] else []
+                all_titles = titles_list + row['_wrong_titles_list']
+                shuffle(all_titles)
 
                 if test_mode:
-                    problem_name_1step = f"test_{count}_1step"
+                    problem_name = f"test_{count}_2step"
                     safe_filename_1step = f"test_{count}_1step"
-                    problem_name_2step = f"test_{count}_2step"
                     safe_filename_2step = f"test_{count}_2step"
                 else:
                     idx_str = str(idx)
-                    problem_name_1step = completed_sentence if completed_sentence else f'problem_{idx_str}_1step'
+                    problem_name = completed_sentence if completed_sentence else f'problem_{idx_str}_2step'
                     safe_filename_1step = f"problem_{idx_str}_1step"
-                    problem_name_2step = completed_sentence if completed_sentence else f'problem_{idx_str}_2step'
                     safe_filename_2step = f"problem_{idx_str}_2step"
 
-                # 1step BRD
-                print(f"Processing problem: {problem_name_1step}")
-                print(f"  Fields: {list(problem_data_1step.keys())}")
-                brd_xml_1step = self.generate_brd(problem_data_1step, problem_name_1step)
-                output_file_1step = out_dir_1step / f"{safe_filename_1step}.brd"
-                xml_content_1step = '<?xml version="1.0" standalone="yes"?>\n'
-                xml_content_1step += self.prettify_xml(brd_xml_1step).split('\n', 1)[1]
-                with open(output_file_1step, 'w', encoding='utf-8') as f:
-                    f.write(xml_content_1step)
-                print(f"  Generated: {output_file_1step}")
-
-                # 2step BRD
-                print(f"Processing problem: {problem_name_2step}")
-                print(f"  Fields: {list(problem_data_2step.keys())}")
-                brd_xml_2step = self.generate_brd(problem_data_2step, problem_name_2step)
-                output_file_2step = out_dir_2step / f"{safe_filename_2step}.brd"
-                xml_content_2step = '<?xml version="1.0" standalone="yes"?>\n'
-                xml_content_2step += self.prettify_xml(brd_xml_2step).split('\n', 1)[1]
-                with open(output_file_2step, 'w', encoding='utf-8') as f:
-                    f.write(xml_content_2step)
-                print(f"  Generated: {output_file_2step}")
-
-        # Write train and test BRDs
-        write_brd_files(train_df, gen_1step, gen_2step, test_mode=False)
-        write_brd_files(test_df, test_1step, test_2step, test_mode=True)
+                jobs.append((row, all_titles, problem_name,
+                             out_dir_1step / f"{safe_filename_1step}.brd",
+                             out_dir_2step / f"{safe_filename_2step}.brd"))
+
+        # Collect train and test BRDs, then write them all in one pass
+        add_brd_jobs(train_df, gen_1step, gen_2step, test_mode=False)
+        add_brd_jobs(test_df, test_1step, test_2step, test_mode=True)
+
+        # Rows are independent, so larger files are generated in parallel worker processes
+        if self.max_workers == 1 or len(jobs) < ROWS_PER_CHUNK:
+            self._log_rows(itertools.starmap(self.write_problem_brds, jobs), len(jobs))
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker) as executor:
+                results = executor.map(_write_problem_brds, jobs, chunksize=ROWS_PER_CHUNK)
+                self._log_rows(results, len(jobs))
 
         print(f"\nAll files generated in: {gen_1step} (train 1step), {gen_2step} (train 2step), {test_1step} (test 1step), and {test_2step} (test 2step)")
-    def __init__(self):
-        self.node_counter = 1
-        self.edge_counter = 1
-        
-    def generate_uuid(self):
-        """Generate a UUID for transaction IDs"""
-        return str(uuid.uuid4())
-    
-    def create_matcher(self, matcher_type, value):
-        """Create a matcher element"""
-        matcher = ET.Element("matcher")
-        matcher_type_elem = ET.SubElement(matcher, "matcherType")
-        matcher_type_elem.text = matcher_type
-        param = ET.SubElement(matcher, "matcherParameter", name="single")
-        param.text = value
-        return matcher
-    
-    def create_action_label(self, selection, action, input_value, hint_message, actor="Tutor (unevaluated)"):
-        """Create an action label element"""
-        action_label = ET.Element("actionLabel")
-        action_label.set("preferPathMark", "true")
-        action_label.set("minTraversals", "1")
-        action_label.set("maxTraversals", "1")
-        
-        # Add sub-elements
-        ET.SubElement(action_label, "studentHintRequest")
-        ET.SubElement(action_label, "stepSuccessfulCompletion")
-        ET.SubElement(action_label, "stepStudentError")
-        
-        unique_id = ET.SubElement(action_label, "uniqueID")
-        unique_id.text = str(self.edge_counter)
-        
-        # Message element
-        message = ET.SubElement(action_label, "message")
-        verb = ET.SubElement(message, "verb")
-        verb.text = "NotePropertySet"
-        
-        properties = ET.SubElement(message, "properties")
-        msg_type = ET.SubElement(properties, "MessageType")
-        msg_type.text = "InterfaceAction"
-        
-        trans_id = ET.SubElement(properties, "transaction_id")
-        trans_id.text = self.generate_uuid()
-        
-        selection_elem = ET.SubElement(properties, "Selection")
-        selection_value = ET.SubElement(selection_elem, "value")
-        selection_value.text = selection
-        
-        action_elem = ET.SubElement(properties, "Action")
-        action_value = ET.SubElement(action_elem, "value")
-        action_value.text = action
-        
-        input_elem = ET.SubElement(properties, "Input")
-        input_value_elem = ET.SubElement(input_elem, "value")
-        input_value_elem.text = input_value
-        
-        # Other elements
-        ET.SubElement(action_label, "buggyMessage")
-        ET.SubElement(action_label, "successMessage")
-        
-        hint_msg = ET.SubElement(action_label, "hintMessage")
-        hint_msg.text = hint_message
-        
-        ET.SubElement(action_label, "callbackFn")
-        
-        action_type = ET.SubElement(action_label, "actionType")
-        action_type.text = "Correct Action"
-        
-        old_action_type = ET.SubElement(action_label, "oldActionType")
-        old_action_type.text = "Correct Action"
-        
-        checked_status = ET.SubElement(action_label, "checkedStatus")
-        checked_status.text = "Never Checked"
-        
-        # Matchers
-        matchers = ET.SubElement(action_label, "matchers")
-        matchers.set("Concatenation", "true")
-        
-        selection_matcher = ET.SubElement(matchers, "Selection")
-        selection_matcher.append(self.create_matcher("ExactMatcher", selection))
-        
-        action_matcher = ET.SubElement(matchers, "Action")
-        action_matcher.append(self.create_matcher("ExactMatcher", action))
-        
-        input_matcher = ET.SubElement(matchers, "Input")
-        input_matcher.append(self.create_matcher("ExactMatcher", input_value))
-        
-        actor_elem = ET.SubElement(matchers, "Actor")
-        actor_elem.set("linkTriggered", "false")
-        actor_elem.text = actor
-        
-        return action_label
-    
-    def create_node(self, text, x_pos, y_pos):
-        """Create a node element"""
-        node = ET.Element("node")
-        node.set("locked", "false")
-        node.set("doneState", "false")
-        
-        text_elem = ET.SubElement(node, "text")
-        text_elem.text = text
-        
-        unique_id = ET.SubElement(node, "uniqueID")
-        unique_id.text = str(self.node_counter)
-        
-        dimension = ET.SubElement(node, "dimension")
-        x = ET.SubElement(dimension, "x")
-        x.text = str(x_pos)
-        y = ET.SubElement(dimension, "y")
-        y.text = str(y_pos)
-        
-        current_id = self.node_counter
-        self.node_counter += 1
-        return node, current_id
-    
-    def create_edge(self, source_id, dest_id, action_label):
-        """Create an edge element"""
-        edge = ET.Element("edge")
-        edge.append(action_label)
-        
-        pre_checked = ET.SubElement(edge, "preCheckedStatus")
-        pre_checked.text = "No-Applicable"
-        
-        rule = ET.SubElement(edge, "rule")
-        rule_text = ET.SubElement(rule, "text")
-        rule_text.text = "unnamed"
-        indicator = ET.SubElement(rule, "indicator")
-        indicator.text = "-1"
-        
-        source_id_elem = ET.SubElement(edge, "sourceID")
-        source_id_elem.text = str(source_id)
-        
-        dest_id_elem = ET.SubElement(edge, "destID")
-        dest_id_elem.text = str(dest_id)
-        
-        traversal_count = ET.SubElement(edge, "traversalCount")
-        traversal_count.text = "0"
-        
-        self.edge_counter += 1
-        return edge
-    
-    def extract_problem_data(self, df, problem_column):
-        """Extract data for a specific problem column"""
-        problem_data = {}
-        
-        for index, row in df.iterrows():
-            field_name = row.iloc[0]  # First column contains field names
-            if pd.notna(field_name) and field_name.strip():
-                field_name = str(field_name).strip()
-                # Clean field name - remove %(...)% wrapper if present
-                if field_name.startswith('%(') and field_name.endswith(')%'):
-                    field_name = field_name[2:-2]
-                
-                value = row[problem_column]
-                if pd.notna(value) and str(value).strip():
-                    problem_data[field_name] = str(value).strip()
-        
-        return problem_data
-    
-    def generate_brd(self, problem_data, problem_name):
-        """Generate BRD XML for a single problem"""
-        # Create root element
+
+    def _log_rows(self, results, n_rows):
+        """Consume the results of write_problem_brds, logging progress per row (in this process, so worker logging needs no setup)"""
+        for count, (output_file_1step, output_file_2step, fields) in enumerate(results, 1):
+            logger.debug("  Fields (2step): %s", fields)
+            logger.info("row %d/%d -> %s, %s", count, n_rows, output_file_1step, output_file_2step)
+
+    def write_problem_brds(self, row, option_words, problem_name, output_file_1step, output_file_2step):
+        """Generate and write the 1step and 2step BRDs for one row of the language translation CSV"""
+        completed_sentence = row['Completed Sentence']
+        words = cut_sentence(completed_sentence) if completed_sentence else []
+
+        # 1step: do not use formal-checkbox
+        problem_data = {
+            'situation-input': row['Situation'],
+            'relationship-a-input': row['Relationship-A'],
+            'relationship-b-input': row['Relationship-B'],
+        }
+        for i, w in enumerate(option_words):
+            problem_data[f'option-word-{i+1}'] = w
+        for i, w in enumerate(words):
+            problem_data[f'person-a-word-{i+1}'] = w
+        # Counts let generate_brd skip scanning for fields that do not exist (never emitted as steps)
+        problem_data['_n_options'] = len(option_words)
+        problem_data['_n_words'] = len(words)
+
+        # 2step: use formal-checkbox
+        problem_data['formal-checkbox'] = row['Formality']
+
+        # Generate the 2step BRD once; the 1step BRD is the same graph without formal-checkbox
+        brd_xml_2step = self.generate_brd(problem_data, problem_name)
+        brd_xml_1step = self.remove_step(brd_xml_2step, 'formal-checkbox')
+
+        self.write_brd(brd_xml_1step, output_file_1step)
+        self.write_brd(brd_xml_2step, output_file_2step)
+        fields = [k for k in problem_data if not k.startswith('_')]
+        return output_file_1step, output_file_2step, fields
+
+    def __init__(self, max_workers=1):
+        self.max_workers = max_workers
+        self._root_template = self.create_root_template()
+        # Transaction IDs only need to be unique, not cryptographically random;
+        # one urandom-seeded RNG avoids a urandom call per edge
+        self._getrandbits = random.Random().getrandbits
+        
+    def create_root_template(self):
+        """Create the stateGraph root with its static attributes and start node messages"""
         root = ET.Element("stateGraph")
         root.set("firstCheckAllStates", "true")
         root.set("caseInsensitive", "true")
@@ -326,9 +289,85 @@ class BRDGenerator:
         msgtype2 = ET.SubElement(props2, "MessageType")
         msgtype2.text = "StartStateEnd"
         
+        return root
+    
+    def generate_uuid(self):
+        """Generate a UUID-formatted (version 4) string for transaction IDs"""
+        b = (self._getrandbits(128) & UUID_CLEAR_MASK) | UUID_V4_BITS
+        return f"{b >> 96:08x}-{(b >> 80) & 0xffff:04x}-{(b >> 64) & 0xffff:04x}-{(b >> 48) & 0xffff:04x}-{b & 0xffffffffffff:012x}"
+    
+    def create_matcher(self, matcher_type, value):
+        """Return the XML string for a matcher element"""
+        return _MATCHER_TEMPLATE.format(mt=xml_escape(matcher_type), v=xml_escape(value))
+    
+    def create_action_label(self, parent, edge_id, selection, action, input_value, hint_message, actor="Tutor (unevaluated)"):
+        """Create an action label element under parent"""
+        action_label = ET.fromstring(_ACTION_LABEL_TEMPLATE.format(
+            unique_id=edge_id,
+            transaction_id=self.generate_uuid(),
+            selection=xml_escape(selection),
+            action=xml_escape(action),
+            input_value=xml_escape(input_value),
+            hint_message=xml_escape(hint_message),
+            selection_matcher=self.create_matcher("ExactMatcher", selection),
+            action_matcher=self.create_matcher("ExactMatcher", action),
+            input_matcher=self.create_matcher("ExactMatcher", input_value),
+            actor=xml_escape(actor),
+        ))
+        parent.append(action_label)
+        return action_label
+    
+    def create_node(self, parent, node_id, text, x_pos, y_pos):
+        """Create a node element under parent"""
+        node = _S(parent, "node", {"locked": "false", "doneState": "false"})
+        _S(node, "text").text = text
+        _S(node, "uniqueID").text = str(node_id)
+        dimension = _S(node, "dimension")
+        _S(dimension, "x").text = str(x_pos)
+        _S(dimension, "y").text = str(y_pos)
+        return node
+    
+    def create_edge(self, parent, edge_id, source_id, dest_id, selection, action, input_value, hint_message, actor="Tutor (unevaluated)"):
+        """Create an edge element (with its action label) under parent"""
+        edge = _S(parent, "edge")
+        self.create_action_label(edge, edge_id, selection, action, input_value, hint_message, actor)
+        _S(edge, "preCheckedStatus").text = "No-Applicable"
+        rule = _S(edge, "rule")
+        _S(rule, "text").text = "unnamed"
+        _S(rule, "indicator").text = "-1"
+        _S(edge, "sourceID").text = str(source_id)
+        _S(edge, "destID").text = str(dest_id)
+        _S(edge, "traversalCount").text = "0"
+        return edge
+    
+    def extract_problem_data(self, df, problem_column):
+        """Extract data for a specific problem column"""
+        problem_data = {}
+        
+        # First column contains field names
+        for field_name, value in zip(df.iloc[:, 0].values, df[problem_column].values):
+            if pd.notna(field_name) and field_name.strip():
+                field_name = str(field_name).strip()
+                # Clean field name - remove %(...)% wrapper if present
+                if field_name.startswith('%(') and field_name.endswith(')%'):
+                    field_name = field_name[2:-2]
+                
+                if pd.notna(value) and str(value).strip():
+                    problem_data[field_name] = str(value).strip()
+        
+        return problem_data
+    
+    def generate_brd(self, problem_data, problem_name):
+        """Generate BRD XML for a single problem"""
+        # Start from a copy of the static stateGraph skeleton
+        root = copy.deepcopy(self._root_template)
+        
         # Collect person-a-word fields in order
         person_words = []
-        for i in range(2, 16):  # Start from 2 since person-a-word-1 comes at the end
+        # Rows from the CSV handler carry their word/option counts; other sources are scanned up to the interface limits
+        n_words = min(problem_data.get('_n_words', MAX_PERSON_WORDS), MAX_PERSON_WORDS)
+        n_options = min(problem_data.get('_n_options', MAX_OPTION_WORDS), MAX_OPTION_WORDS)
+        for i in range(2, n_words + 1):  # Start from 2 since person-a-word-1 comes at the end
             field_name = f"person-a-word-{i}"
             if field_name in problem_data:
                 person_words.append((field_name, problem_data[field_name]))
@@ -346,7 +385,7 @@ class BRDGenerator:
             steps.append((field_name, value, "UpdateTextField", "Tutor (unevaluated)"))
         
         # Option word steps
-        for i in range(1, 6):
+        for i in range(1, n_options + 1):
             field_name = f"option-word-{i}"
             if field_name in problem_data:
                 steps.append((field_name, problem_data[field_name], "UpdateTextField", "Tutor (unevaluated)"))
@@ -361,16 +400,13 @@ class BRDGenerator:
         # Done button (always last)
         steps.append(('done', '-1', "ButtonPressed", "Student"))
         
-        # Create nodes
-        nodes = []
+        # Create nodes (IDs are numbered from 1 within each BRD)
         x_positions = [217, -83]
         y_pos = 25
         y_increment = 160
         
         # First node (empty)
-        node, node_id = self.create_node("empty", x_positions[0], y_pos)
-        nodes.append((node, node_id))
-        root.append(node)
+        self.create_node(root, 1, "empty", x_positions[0], y_pos)
         y_pos += y_increment
         
         # Create nodes for each step
@@ -378,9 +414,7 @@ class BRDGenerator:
             x_pos = x_positions[(i + 1) % 2]
             node_text = f"state{i + 2}"
             
-            node, node_id = self.create_node(node_text, x_pos, y_pos)
-            nodes.append((node, node_id))
-            root.append(node)
+            self.create_node(root, i + 2, node_text, x_pos, y_pos)
             y_pos += y_increment
         
         # Create edges
@@ -390,21 +424,63 @@ class BRDGenerator:
             else:
                 hint_message = f'Please enter "{value}" in the highlighted field.'
             
-            action_label = self.create_action_label(field, action, value, hint_message, actor)
-            edge = self.create_edge(nodes[i][1], nodes[i + 1][1], action_label)
-            root.append(edge)
+            # Edge i + 1 links the node before step i to the node after it
+            self.create_edge(root, i + 1, i + 1, i + 2, field, action, value, hint_message, actor)
         
         # Add EdgesGroups
-        edges_groups = ET.SubElement(root, "EdgesGroups")
-        edges_groups.set("ordered", "false")
+        _S(root, "EdgesGroups", {"ordered": "false"})
+        
+        return root
+    
+    def remove_step(self, root, selection):
+        """Return a copy of a generated BRD with the step for selection removed and the graph renumbered.
+        The copy gets fresh transaction IDs so it shares none with the original."""
+        root = copy.deepcopy(root)
+        for edge in root.iterfind("edge"):
+            if edge.findtext("actionLabel/message/properties/Selection/value") == selection:
+                self._remove_edge(root, edge)
+                break
+        
+        for transaction_id in root.iterfind("edge/actionLabel/message/properties/transaction_id"):
+            transaction_id.text = self.generate_uuid()
         
         return root
     
-    def prettify_xml(self, elem):
-        """Return a pretty-printed XML string for the Element."""
-        rough_string = ET.tostring(elem, 'unicode')
-        reparsed = minidom.parseString(rough_string)
-        return reparsed.toprettyxml(indent="    ")
+    def _remove_edge(self, root, edge):
+        """Remove edge and its destination node from root, renumbering the nodes and edges after them"""
+        removed_node = int(edge.findtext("destID"))
+        removed_edge = int(edge.findtext("actionLabel/uniqueID"))
+        root.remove(edge)
+        
+        # Later nodes move up one slot, taking over the text and position of the node before them
+        nodes = root.findall("node")
+        layout = [(n.findtext("text"), n.findtext("dimension/x"), n.findtext("dimension/y")) for n in nodes]
+        for i, node in enumerate(nodes):
+            node_id = int(node.findtext("uniqueID"))
+            if node_id == removed_node:
+                root.remove(node)
+            elif node_id > removed_node:
+                node.find("uniqueID").text = str(node_id - 1)
+                node.find("text").text, node.find("dimension/x").text, node.find("dimension/y").text = layout[i - 1]
+        
+        # The removed edge's successor now starts from the removed edge's source
+        for edge in root.iterfind("edge"):
+            for tag in ("sourceID", "destID"):
+                elem = edge.find(tag)
+                if int(elem.text) >= removed_node:
+                    elem.text = str(int(elem.text) - 1)
+            unique_id = edge.find("actionLabel/uniqueID")
+            if int(unique_id.text) > removed_edge:
+                unique_id.text = str(int(unique_id.text) - 1)
+    
+    def write_brd(self, elem, output_file):
+        """Pretty-print the Element and serialize it straight to output_file."""
+        ET.indent(elem, space="    ")
+        with open(output_file, 'wb') as f:
+            # ElementTree cannot emit standalone="yes", so the declaration is written manually
+            f.write(XML_DECLARATION)
+            ET.ElementTree(elem).write(f, encoding='utf-8', xml_declaration=False)
+            f.write(b'\n')
     
     def process_excel_file(self, excel_path, output_dir=None):
         """Process Excel, TSV, or CSV file and generate BRD files. Also trims rows/columns with empty first cell."""
@@ -412,10 +488,13 @@ class BRDGenerator:
             ext = str(excel_path).lower()
             if ext.endswith('.csv'):
                 # Use the new CSV format handler if columns match
-                df = pd.read_csv(excel_path, dtype=str)
-                expected_cols = {'Situation','Relationship-A','Relationship-B','Formality','Title','Wrong Titles','Completed Sentence'}
-                if expected_cols.issubset(set(df.columns)):
-                    return self.process_csv_language_translation(excel_path, output_dir)
+                df = read_csv(excel_path)
+                if set(LANGUAGE_TRANSLATION_COLUMNS).issubset(set(df.columns)):
+                    return self.process_csv_language_translation(excel_path, output_dir, df=df)
+                if pyarrow_csv_engine_available():
+                    # The column-per-problem layout relies on the C engine renaming duplicate
+                    # and empty headers (sq1.1, Unnamed: N), which the pyarrow engine does not do
+                    df = pd.read_csv(excel_path, dtype=str)
                 print(f"Loaded CSV file with {len(df)} rows and {len(df.columns)} columns")
             elif ext.endswith('.tsv') or ext.endswith('.txt'):
                 df = pd.read_csv(excel_path, sep='\t', dtype=str)
@@ -430,15 +509,17 @@ class BRDGenerator:
 
             # Drop rows where the first cell is empty or NaN
             first_col = df.columns[0]
-            df = df[df[first_col].notna() & (df[first_col].astype(str).str.strip() != '')]
+            mask = df[first_col].notna() & (df[first_col].astype(str).str.strip() != '')
+            df = df.loc[mask]
 
-            # Drop columns where the first cell (row 0) is empty or NaN
-            cols_to_keep = [df.columns[0]]
-            for col in df.columns[1:]:
-                first_cell = df[col].iloc[0] if len(df) > 0 else None
-                if pd.notna(first_cell) and str(first_cell).strip() != '':
-                    cols_to_keep.append(col)
-            df = df[cols_to_keep]
+            # Drop columns where the first cell (row 0) is empty or NaN (the field name column is always kept)
+            if len(df) > 0:
+                first_row = df.iloc[0]
+                keep = first_row.notna() & (first_row.astype(str).str.strip() != '')
+            else:
+                keep = pd.Series(False, index=df.columns)
+            keep.iloc[0] = True
+            df = df.loc[:, keep.values]
 
             if output_dir is None:
                 output_dir = Path(excel_path).parent / "brd_generated"
@@ -449,9 +530,6 @@ class BRDGenerator:
 
             # Process each column (except the first which contains field names)
             for col_index in range(1, len(df.columns)):
-                self.node_counter = 1
-                self.edge_counter = 1
-
                 problem_column = df.columns[col_index]
                 problem_name = str(problem_column)
 
@@ -487,12 +565,7 @@ class BRDGenerator:
                 safe_filename = problem_name.replace(' ', '_').replace('/', '_').replace('\\', '_')
                 output_file = output_dir / f"{safe_filename}.brd"
 
-                # Add XML declaration manually
-                xml_content = '<?xml version="1.0" standalone="yes"?>\n'
-                xml_content += self.prettify_xml(brd_xml).split('\n', 1)[1]
-
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    f.write(xml_content)
+                self.write_brd(brd_xml, output_file)
 
                 print(f"  Generated: {output_file}")
 
@@ -505,18 +578,37 @@ class BRDGenerator:
             sys.exit(1)
 
 
+def positive_int(value):
+    """argparse type for counts that must be at least 1"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
 def main():
     parser = argparse.ArgumentParser(description='Convert Excel, TSV, or CSV data to BRD format (columns as problems). Rows and columns with empty first cell are ignored. For CSVs in the language translation format, Chinese sentences are split into words using jieba.')
     parser.add_argument('excel_file', help='Path to the Excel (.xlsx, .xls), TSV (.tsv, .txt), or CSV (.csv) file')
     parser.add_argument('-o', '--output', help='Output directory (default: ./brd_generated)')
+    parser.add_argument('-j', '--jobs', type=positive_int, default=None, help='Worker processes for CSV rows (default: number of CPUs, 1 disables multiprocessing)')
 
     args = parser.parse_args()
 
+    # Per-row progress is logged at INFO; set LOGLEVEL=INFO (or DEBUG) to see it
+    log_level = os.environ.get('LOGLEVEL', 'WARNING').upper()
+    if not isinstance(logging.getLevelName(log_level), int):
+        print(f"Warning: unknown LOGLEVEL '{log_level}', using WARNING")
+        log_level = 'WARNING'
+    logging.basicConfig(level=log_level, format='%(message)s')
+
     if not Path(args.excel_file).exists():
         print(f"Error: Input file '{args.excel_file}' not found")
         sys.exit(1)
 
-    generator = BRDGenerator()
+    generator = BRDGenerator(max_workers=args.jobs)
     generator.process_excel_file(args.excel_file, args.output)
 
 
@@ -0,0 +1,53 @@
+"""Checks for excelToBrd.BRDGenerator (run with: python -m pytest test_excelToBrd.py)"""
+
+import xml.etree.ElementTree as ET
+
+from excelToBrd import BRDGenerator
+
+
+TRANSACTION_ID_PATH = "edge/actionLabel/message/properties/transaction_id"
+
+
+def make_problem_data(n_options, n_words):
+    problem_data = {
+        'situation-input': 'in restaurant',
+        'relationship-a-input': 'vendor',
+        'relationship-b-input': 'customer',
+    }
+    for i in range(n_options):
+        problem_data[f'option-word-{i+1}'] = f'title{i+1}'
+    for i in range(n_words):
+        problem_data[f'person-a-word-{i+1}'] = f'word{i+1}'
+    return problem_data
+
+
+def canonical(root):
+    """Serialize root with transaction IDs blanked, since they are random"""
+    root = ET.fromstring(ET.tostring(root))
+    for transaction_id in root.iterfind(TRANSACTION_ID_PATH):
+        transaction_id.text = None
+    return ET.tostring(root, encoding='unicode')
+
+
+def test_remove_step_matches_direct_generation():
+    generator = BRDGenerator(max_workers=1)
+    for n_options, n_words in [(0, 0), (1, 1), (4, 5), (5, 15)]:
+        problem_data_1step = make_problem_data(n_options, n_words)
+        problem_data_2step = dict(problem_data_1step, **{'formal-checkbox': 'Formal'})
+
+        expected = generator.generate_brd(problem_data_1step, 'problem')
+        derived = generator.remove_step(generator.generate_brd(problem_data_2step, 'problem'), 'formal-checkbox')
+
+        assert canonical(derived) == canonical(expected)
+
+
+def test_remove_step_uses_new_transaction_ids():
+    generator = BRDGenerator(max_workers=1)
+    problem_data = dict(make_problem_data(3, 4), **{'formal-checkbox': 'Informal'})
+    brd_2step = generator.generate_brd(problem_data, 'problem')
+    brd_1step = generator.remove_step(brd_2step, 'formal-checkbox')
+
+    ids_2step = {e.text for e in brd_2step.iterfind(TRANSACTION_ID_PATH)}
+    ids_1step = {e.text for e in brd_1step.iterfind(TRANSACTION_ID_PATH)}
+    assert len(ids_1step) == len(brd_1step.findall("edge"))
+    assert not ids_1step & ids_2step